@@ -1,15 +1,37 @@
 # agents/coral_utils.py
 import json
+import time
 import uuid
 import hmac
-import hashlib
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback below
+    orjson = None
+
+# the signing wire format is json.dumps(sort_keys=True, separators=(",", ":")), byte for byte,
+# so peers on older versions keep verifying; one shared encoder skips json.dumps' per-call setup.
+# Non-finite floats are refused rather than signed as non-standard Infinity/NaN tokens.
+_SIGNING_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), allow_nan=False)
+
+
+# (epoch second, formatted string); swapped as one tuple so readers never see a torn pair
+_now_cache = (0, "")
 
 
 def now_iso() -> str:
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    # second resolution, so the string only needs formatting once per second
+    global _now_cache
+    sec = int(time.time())
+    cached_sec, cached = _now_cache
+    if sec != cached_sec:
+        cached = datetime.utcfromtimestamp(sec).isoformat() + "Z"
+        _now_cache = (sec, cached)
+    return cached
 
 
 def make_message(
@@ -31,14 +53,36 @@ def make_message(
     }
 
 
+def unpack_envelope(envelope: Any) -> Tuple[Any, Any, Any, Dict[str, Any]]:
+    """
+    (id, type, from, body) of either a plain dict message or a typed agents.envelope.Envelope.
+    """
+    if isinstance(envelope, dict):
+        return envelope.get("id"), envelope.get("type"), envelope.get("from"), envelope.get("body") or {}
+    return envelope.id, envelope.type, envelope.from_, envelope.body
+
+
+def dumps_envelope(envelope: Dict[str, Any]) -> bytes:
+    # wire format for the broker boundary; key order is not significant here
+    if orjson is not None:
+        return orjson.dumps(envelope)
+    return json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+
+
 def _serialize_for_signing(message: Dict[str, Any]) -> bytes:
-    # deterministic JSON for signature
-    return json.dumps(message, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    # deterministic JSON for signature; ASCII-only, so the utf-8 encode is a plain copy
+    return _SIGNING_ENCODER.encode(message).encode("utf-8")
+
+
+@lru_cache(maxsize=32)
+def _secret_bytes(secret: str) -> bytes:
+    return secret.encode("utf-8")
 
 
 def sign_message(message: Dict[str, Any], secret: str) -> str:
     payload = _serialize_for_signing(message)
-    return hmac.new(secret.encode("utf-8"), payload, hashlib.sha256).hexdigest()
+    # one-shot C HMAC: no Python-level hmac object per call
+    return hmac.digest(_secret_bytes(secret), payload, "sha256").hex()
 
 
 def verify_signature(message: Dict[str, Any], signature: str, secret: str) -> bool:
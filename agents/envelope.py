@@ -0,0 +1,46 @@
+# agents/envelope.py
+"""
+Typed Coral envelope for the broker boundary.
+Raw JSON bytes decode straight into a slotted Envelope struct, so agents read
+fields by attribute instead of going through nested dict lookups.
+Callers that send the same kind of message repeatedly build a template once and
+stamp it per request, swapping only id, timestamp and body.
+"""
+
+import uuid
+from typing import Any, Dict
+
+import msgspec
+
+from .coral_utils import now_iso
+
+
+class Envelope(msgspec.Struct):
+    id: str
+    type: str
+    from_: str = msgspec.field(name="from")
+    to: str
+    timestamp: str
+    body: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = {}
+
+
+_DECODER = msgspec.json.Decoder(Envelope)
+
+
+def decode_envelope(raw: bytes) -> Envelope:
+    """
+    Decode a JSON message into an Envelope; raises msgspec.ValidationError if a field is missing or mistyped.
+    """
+    return _DECODER.decode(raw)
+
+
+def envelope_template(msg_type: str, sender: str, recipient: str) -> Envelope:
+    """
+    Fixed routing fields for one kind of message; pass to stamp() to get a sendable envelope.
+    """
+    return Envelope(id="", type=msg_type, from_=sender, to=recipient, timestamp="")
+
+
+def stamp(template: Envelope, body: Dict[str, Any]) -> Envelope:
+    return msgspec.structs.replace(template, id=str(uuid.uuid4()), timestamp=now_iso(), body=body)
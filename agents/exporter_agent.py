@@ -1,16 +1,18 @@
 # agents/exporter_agent.py
 import os
+import csv
 import json
-import pandas as pd
-import gspread
-from typing import Dict, Any
-from .coral_utils import now_iso
+from typing import Dict, Any, Union
+from .coral_utils import now_iso, dumps_envelope, unpack_envelope
+from .envelope import Envelope, decode_envelope
+from .google_clients import get_gspread_client
 from settings import OUTPUT_DIR, GOOGLE_CREDS_JSON
-from oauth2client.service_account import ServiceAccountCredentials
 
 # Optional Google Sheets setup
 USE_GSHEETS = bool(GOOGLE_CREDS_JSON)
-GSCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# column order for line-item exports
+LINE_ITEM_FIELDS = ("description", "quantity", "unit_price", "total")
 
 
 class ExporterAgent:
@@ -21,8 +23,8 @@ class ExporterAgent:
         self.gc = None
         if USE_GSHEETS:
             try:
-                creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_CREDS_JSON, GSCOPE)
-                self.gc = gspread.authorize(creds)
+                # shared per process; repeated agents don't re-read the key or re-authorize
+                self.gc = get_gspread_client(GOOGLE_CREDS_JSON)
             except Exception as e:
                 # keep going without sheets
                 print("Failed to init gspread:", e)
@@ -30,35 +32,38 @@ class ExporterAgent:
 
     def export_csv(self, invoice: Dict[str, Any], filename: str) -> str:
         path = os.path.join(self.export_dir, f"{filename}.csv")
-        df = pd.DataFrame(invoice.get("line_items", []))
-        df.to_csv(path, index=False)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(LINE_ITEM_FIELDS)
+            writer.writerows([it.get(field) for field in LINE_ITEM_FIELDS] for it in invoice.get("line_items", []))
         return path
 
     def export_xlsx(self, invoice: Dict[str, Any], filename: str) -> str:
+        import xlsxwriter
+
         path = os.path.join(self.export_dir, f"{filename}.xlsx")
-        df = pd.DataFrame(invoice.get("line_items", []))
-        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-            df.to_excel(writer, sheet_name="LineItems", index=False)
+        # constant_memory streams each row to disk as it is written
+        options = {"constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False}
+        with xlsxwriter.Workbook(path, options) as workbook:
+            ws = workbook.add_worksheet("LineItems")
+            ws.write_row(0, 0, LINE_ITEM_FIELDS)
+            for row, it in enumerate(invoice.get("line_items", []), start=1):
+                ws.write_row(row, 0, [it.get(field) for field in LINE_ITEM_FIELDS])
+
             # write a simple summary sheet
-            workbook = writer.book
-            try:
-                summary_sheet = workbook.add_worksheet("Summary")  # xlsxwriter method
-                # xlsxwriter workbook API uses worksheet.write(row, col, value)
-                summary_sheet.write(0, 0, "Invoice Number")
-                summary_sheet.write(0, 1, invoice.get("invoice_number"))
-                summary_sheet.write(1, 0, "Vendor")
-                summary_sheet.write(1, 1, invoice.get("vendor"))
-                summary_sheet.write(2, 0, "Date")
-                summary_sheet.write(2, 1, invoice.get("date"))
-                summary_sheet.write(3, 0, "Subtotal")
-                summary_sheet.write(3, 1, invoice.get("subtotal"))
-                summary_sheet.write(4, 0, "Tax")
-                summary_sheet.write(4, 1, invoice.get("tax"))
-                summary_sheet.write(5, 0, "Total")
-                summary_sheet.write(5, 1, invoice.get("total"))
-            except Exception:
-                # ignore if engine doesn't support this in type hints
-                pass
+            summary_sheet = workbook.add_worksheet("Summary")
+            summary_sheet.write(0, 0, "Invoice Number")
+            summary_sheet.write(0, 1, invoice.get("invoice_number"))
+            summary_sheet.write(1, 0, "Vendor")
+            summary_sheet.write(1, 1, invoice.get("vendor"))
+            summary_sheet.write(2, 0, "Date")
+            summary_sheet.write(2, 1, invoice.get("date"))
+            summary_sheet.write(3, 0, "Subtotal")
+            summary_sheet.write(3, 1, invoice.get("subtotal"))
+            summary_sheet.write(4, 0, "Tax")
+            summary_sheet.write(4, 1, invoice.get("tax"))
+            summary_sheet.write(5, 0, "Total")
+            summary_sheet.write(5, 1, invoice.get("total"))
         return path
 
     def export_gsheets(self, invoice: Dict[str, Any], filename: str) -> str:
@@ -69,32 +74,29 @@ class ExporterAgent:
         # share (optional) - by default service account owns it; to view in web you may need to share with your user
         # write line items
         ws = sh.sheet1
-        # header row
-        headers = ["description", "quantity", "unit_price", "total"]
-        ws.append_row(headers)
-        for it in invoice.get("line_items", []):
-            ws.append_row([it.get("description"), it.get("quantity"), it.get("unit_price"), it.get("total")])
+        # header row + line items in a single values.append request (one API round-trip
+        # instead of one per row); unlike a fixed-range update it grows the grid as needed
+        headers = list(LINE_ITEM_FIELDS)
+        rows = [[it.get(field) for field in LINE_ITEM_FIELDS] for it in invoice.get("line_items", [])]
+        ws.append_rows([headers] + rows, value_input_option="RAW")
         # add summary in later sheet
         try:
-            sh.add_worksheet(title="Summary", rows=10, cols=3)
-            s = sh.worksheet("Summary")
-            s.update("A1", "Invoice Number")
-            s.update("B1", invoice.get("invoice_number"))
-            s.update("A2", "Vendor")
-            s.update("B2", invoice.get("vendor"))
-            s.update("A3", "Date")
-            s.update("B3", invoice.get("date"))
+            s = sh.add_worksheet(title="Summary", rows=10, cols=3)
+            summary = [
+                ["Invoice Number", invoice.get("invoice_number")],
+                ["Vendor", invoice.get("vendor")],
+                ["Date", invoice.get("date")],
+            ]
+            s.update(range_name="A1:B3", values=summary, value_input_option="RAW")
         except Exception:
             pass
         # return the web url
         return sh.url
 
-    def handle_coral(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
-        intent = envelope.get("type")
-        sender = envelope.get("from")
-        body = envelope.get("body", {})
+    def handle_coral(self, envelope: Union[Dict[str, Any], Envelope]) -> Dict[str, Any]:
+        msg_id, intent, sender, body = unpack_envelope(envelope)
         resp = {
-            "id": f"resp-{envelope.get('id')}",
+            "id": f"resp-{msg_id}",
             "type": f"{intent}.response",
             "from": self.id,
             "to": sender,
@@ -129,3 +131,7 @@ class ExporterAgent:
 
         resp["body"] = {"status": "FAIL", "error": f"unsupported intent {intent}"}
         return resp
+
+    def handle_coral_bytes(self, raw: bytes) -> bytes:
+        # broker boundary: JSON bytes in, JSON bytes out, no intermediate request dict
+        return dumps_envelope(self.handle_coral(decode_envelope(raw)))
@@ -0,0 +1,35 @@
+# agents/google_clients.py
+"""
+Process-wide Google API clients.
+The service-account key is parsed and the clients are built once per key file, so
+every Sheets export reuses the same credentials and HTTP session.
+"""
+
+from functools import lru_cache
+
+from settings import GOOGLE_CREDS_JSON
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+
+@lru_cache(maxsize=4)
+def _credentials(service_file: str):
+    # imported here so the Google client stack only loads when Sheets is configured
+    from google.oauth2.service_account import Credentials
+
+    return Credentials.from_service_account_file(service_file, scopes=SCOPES)
+
+
+@lru_cache(maxsize=4)
+def get_gspread_client(service_file: str = GOOGLE_CREDS_JSON):
+    import gspread
+
+    return gspread.authorize(_credentials(service_file))
+
+
+@lru_cache(maxsize=4)
+def get_drive_service(service_file: str = GOOGLE_CREDS_JSON):
+    from googleapiclient.discovery import build
+
+    # cache_discovery=False skips the discovery-document file cache lookup on every build
+    return build("drive", "v3", credentials=_credentials(service_file), cache_discovery=False)
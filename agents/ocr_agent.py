@@ -1,6 +1,7 @@
 # agents/ocr_agent.py
-from typing import Dict, Any
-from .coral_utils import now_iso
+from typing import Dict, Any, List, Union
+from .coral_utils import now_iso, dumps_envelope, unpack_envelope
+from .envelope import Envelope, decode_envelope
 
 
 class OCRAgent:
@@ -10,14 +11,16 @@ class OCRAgent:
     - Returns a simple 'invoice_text' in the body for downstream parsing
     """
 
+    # the simulated OCR has no real batch backend, so api.ocr_batcher sends it one message at a time
+    supports_batch = False
+
     def __init__(self):
         self.id = "ocr-agent"
 
-    def handle_coral(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
-        intent = envelope.get("type")
-        sender = envelope.get("from")
+    def handle_coral(self, envelope: Union[Dict[str, Any], Envelope]) -> Dict[str, Any]:
+        msg_id, intent, sender, body = unpack_envelope(envelope)
         resp = {
-            "id": f"resp-{envelope.get('id')}",
+            "id": f"resp-{msg_id}",
             "type": f"{intent}.response",
             "from": self.id,
             "to": sender,
@@ -27,7 +30,7 @@ class OCRAgent:
 
         if intent == "ocr.extract":
             # Expect body.file_info = {"filename": ..., "content": <optional raw bytes or text>}
-            file_info = envelope.get("body", {}).get("file_info", {})
+            file_info = body.get("file_info", {})
             filename = file_info.get("filename", "unknown")
             # *** Replace this simulated OCR with real OCR (pytesseract) in production ***
             simulated_text = (
@@ -39,3 +42,36 @@ class OCRAgent:
 
         resp["body"] = {"status": "FAIL", "error": f"unsupported intent {intent}"}
         return resp
+
+    def handle_coral_batch(self, envelopes: List[Union[Dict[str, Any], Envelope]]) -> List[Dict[str, Any]]:
+        """
+        One response per envelope, in order. A batch-capable OCR backend (multi-image
+        tesseract, cloud batch API) plugs in here and sets supports_batch; the simulated
+        OCR just maps handle_coral.
+        """
+        results = []
+        for envelope in envelopes:
+            # one bad file must not fail the rest of the batch
+            try:
+                results.append(self.handle_coral(envelope))
+            except Exception as e:
+                results.append(self._fail_response(envelope, e))
+        return results
+
+    def _fail_response(self, envelope: Union[Dict[str, Any], Envelope], err: Exception) -> Dict[str, Any]:
+        try:
+            msg_id, intent, sender, _ = unpack_envelope(envelope)
+        except Exception:
+            msg_id, intent, sender = "unknown", "ocr.extract", None
+        return {
+            "id": f"resp-{msg_id}",
+            "type": f"{intent}.response",
+            "from": self.id,
+            "to": sender,
+            "timestamp": now_iso(),
+            "body": {"status": "FAIL", "error": str(err)},
+        }
+
+    def handle_coral_bytes(self, raw: bytes) -> bytes:
+        # broker boundary: JSON bytes in, JSON bytes out, no intermediate request dict
+        return dumps_envelope(self.handle_coral(decode_envelope(raw)))
@@ -1,7 +1,18 @@
 # agents/parser_agent.py
-from typing import Dict, Any
+from typing import Dict, Any, Union
 import re
-from .coral_utils import now_iso
+from .coral_utils import now_iso, dumps_envelope, unpack_envelope
+from .envelope import Envelope, decode_envelope
+
+# compiled once at import; _basic_parse runs these on every invoice
+_PAT_INV = re.compile(r"(INV[-\s]?\d+)", re.IGNORECASE)
+_PAT_DATE = re.compile(r"Date[:\s]*([0-9]{4}[-/][0-9]{2}[-/][0-9]{2})")
+_PAT_VENDOR = re.compile(r"Vendor[:\s]*(.+)")
+# [^\S\r\n] is whitespace other than a line break, so an item never spans lines
+_PAT_LINEITEM = re.compile(r"(\d+)[^\S\r\n]*x[^\S\r\n]*(.+?)@[^\S\r\n]*([\d.,]+)[^\S\r\n]*=[^\S\r\n]*([\d.,]+)")
+_PAT_SUBTOTAL = re.compile(r"Subtotal[:\s]*([\d.,]+)")
+_PAT_TAX = re.compile(r"Tax[:\s]*([\d.,]+)")
+_PAT_TOTAL = re.compile(r"Total[:\s]*([\d.,]+)")
 
 
 class ParserAgent:
@@ -17,38 +28,36 @@ class ParserAgent:
     def _basic_parse(self, text: str) -> Dict[str, Any]:
         # Very simple extraction for demo purposes — replace with robust logic or ML model
         invoice_number = None
-        m = re.search(r"(INV[-\s]?\d+)", text, re.IGNORECASE)
+        m = _PAT_INV.search(text)
         if m:
             invoice_number = m.group(1).upper()
         else:
             invoice_number = "INV-UNKNOWN"
 
         # date
-        m = re.search(r"Date[:\s]*([0-9]{4}[-/][0-9]{2}[-/][0-9]{2})", text)
+        m = _PAT_DATE.search(text)
         date = m.group(1) if m else "1970-01-01"
 
         # vendor
-        m = re.search(r"Vendor[:\s]*(.+)", text)
+        m = _PAT_VENDOR.search(text)
         vendor = m.group(1).strip() if m else "Unknown Vendor"
 
         # items & totals: naive extraction
         # find lines with pattern: qty x desc @ unit = total or description lines
         line_items = []
-        for line in text.splitlines():
-            m = re.search(r"(\d+)\s*x\s*(.+?)@\s*([\d.,]+)\s*=\s*([\d.,]+)", line)
-            if m:
-                qty = float(m.group(1))
-                desc = m.group(2).strip()
-                unit = float(m.group(3).replace(",", ""))
-                total = float(m.group(4).replace(",", ""))
-                line_items.append(
-                    {
-                        "description": desc,
-                        "quantity": qty,
-                        "unit_price": unit,
-                        "total": total,
-                    }
-                )
+        for m in _PAT_LINEITEM.finditer(text):
+            qty = float(m.group(1))
+            desc = m.group(2).strip()
+            unit = float(m.group(3).replace(",", ""))
+            total = float(m.group(4).replace(",", ""))
+            line_items.append(
+                {
+                    "description": desc,
+                    "quantity": qty,
+                    "unit_price": unit,
+                    "total": total,
+                }
+            )
 
         # fallback simple item if none found
         if not line_items:
@@ -62,15 +71,15 @@ class ParserAgent:
             ]
 
         # subtotal/tax/total
-        m = re.search(r"Subtotal[:\s]*([\d.,]+)", text)
+        m = _PAT_SUBTOTAL.search(text)
         subtotal = (
             float(m.group(1).replace(",", ""))
             if m
             else sum(i["total"] for i in line_items)
         )
-        m = re.search(r"Tax[:\s]*([\d.,]+)", text)
+        m = _PAT_TAX.search(text)
         tax = float(m.group(1).replace(",", "")) if m else round(subtotal * 0.1, 2)
-        m = re.search(r"Total[:\s]*([\d.,]+)", text)
+        m = _PAT_TOTAL.search(text)
         total = float(m.group(1).replace(",", "")) if m else subtotal + tax
 
         invoice = {
@@ -84,11 +93,10 @@ class ParserAgent:
         }
         return invoice
 
-    def handle_coral(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
-        intent = envelope.get("type")
-        sender = envelope.get("from")
+    def handle_coral(self, envelope: Union[Dict[str, Any], Envelope]) -> Dict[str, Any]:
+        msg_id, intent, sender, body = unpack_envelope(envelope)
         resp = {
-            "id": f"resp-{envelope.get('id')}",
+            "id": f"resp-{msg_id}",
             "type": f"{intent}.response",
             "from": self.id,
             "to": sender,
@@ -97,10 +105,14 @@ class ParserAgent:
         }
 
         if intent == "parser.parse_text":
-            text = envelope.get("body", {}).get("invoice_text", "")
+            text = body.get("invoice_text", "")
             invoice = self._basic_parse(text)
             resp["body"] = {"invoice": invoice}
             return resp
 
         resp["body"] = {"status": "FAIL", "error": f"unsupported intent {intent}"}
         return resp
+
+    def handle_coral_bytes(self, raw: bytes) -> bytes:
+        # broker boundary: JSON bytes in, JSON bytes out, no intermediate request dict
+        return dumps_envelope(self.handle_coral(decode_envelope(raw)))
@@ -1,8 +1,73 @@
 # agents/validator_agent.py
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 import jsonschema
 from datetime import datetime
-from .coral_utils import now_iso
+from .coral_utils import now_iso, dumps_envelope, unpack_envelope
+from .envelope import Envelope, decode_envelope
+
+try:
+    import fastjsonschema
+except ImportError:  # jsonschema fallback below
+    fastjsonschema = None
+
+# accept "2025/09/18" as well as ISO "2025-09-18"
+_DATE_SEP = str.maketrans("/", "-")
+
+_TOTAL_FIELDS = ("subtotal", "tax", "total")
+_LINE_ITEM_NUMERIC_FIELDS = ("quantity", "unit_price", "total")
+
+# shared by every ValidatorAgent built without an explicit schema; never mutated
+_DEFAULT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "required": [
+        "invoice_number",
+        "date",
+        "vendor",
+        "line_items",
+        "subtotal",
+        "tax",
+        "total",
+    ],
+    "properties": {
+        "invoice_number": {"type": "string"},
+        "date": {"type": "string"},
+        "vendor": {"type": "string"},
+        "line_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["description", "quantity", "unit_price", "total"],
+                "properties": {
+                    "description": {"type": "string"},
+                    "quantity": {"type": ["number", "integer", "string"]},
+                    "unit_price": {"type": ["number", "integer", "string"]},
+                    "total": {"type": ["number", "integer", "string"]},
+                },
+                "additionalProperties": True,
+            },
+        },
+        "subtotal": {"type": ["number", "integer", "string"]},
+        "tax": {"type": ["number", "integer", "string"]},
+        "total": {"type": ["number", "integer", "string"]},
+    },
+    "additionalProperties": True,
+}
+
+
+def _compile_schema(schema: Dict[str, Any]):
+    """
+    Code-generate a validator for the schema, or None to use jsonschema instead
+    (fastjsonschema missing, or the schema uses something it cannot compile).
+    """
+    if fastjsonschema is None:
+        return None
+    try:
+        return fastjsonschema.compile(schema)
+    except fastjsonschema.JsonSchemaDefinitionException:
+        return None
+
+
+_DEFAULT_FAST_VALIDATE = _compile_schema(_DEFAULT_SCHEMA)
 
 
 class ValidatorAgent:
@@ -16,47 +81,25 @@ class ValidatorAgent:
         rules: Optional[Dict[str, Any]] = None,
     ):
         self.id = "validator-agent"
-        self.schema = schema or self._default_schema()
         self.rules = rules or {}
-
-    def _default_schema(self) -> Dict[str, Any]:
-        return {
-            "type": "object",
-            "required": [
-                "invoice_number",
-                "date",
-                "vendor",
-                "line_items",
-                "subtotal",
-                "tax",
-                "total",
-            ],
-            "properties": {
-                "invoice_number": {"type": "string"},
-                "date": {"type": "string"},
-                "vendor": {"type": "string"},
-                "line_items": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "required": ["description", "quantity", "unit_price", "total"],
-                        "properties": {
-                            "description": {"type": "string"},
-                            "quantity": {"type": ["number", "integer", "string"]},
-                            "unit_price": {"type": ["number", "integer", "string"]},
-                            "total": {"type": ["number", "integer", "string"]},
-                        },
-                        "additionalProperties": True,
-                    },
-                },
-                "subtotal": {"type": ["number", "integer", "string"]},
-                "tax": {"type": ["number", "integer", "string"]},
-                "total": {"type": ["number", "integer", "string"]},
-            },
-            "additionalProperties": True,
-        }
+        if schema:
+            self.schema = schema
+            self._fast_validate = _compile_schema(schema)
+        else:
+            self.schema = _DEFAULT_SCHEMA
+            self._fast_validate = _DEFAULT_FAST_VALIDATE
 
     def validate_schema(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self._fast_validate is not None:
+            try:
+                self._fast_validate(data)
+            except fastjsonschema.JsonSchemaValueException as e:
+                # stops at the first error; its path is rooted at "data" and
+                # array indexes come back as strings, so reshape it like jsonschema's
+                path = [int(p) if p.isdigit() else p for p in e.path[1:]]
+                return [{"message": e.message, "path": path, "validator": e.rule}]
+            return []
+
         validator = jsonschema.Draft7Validator(self.schema)
         errors: List[Dict[str, Any]] = []
         for error in validator.iter_errors(data):
@@ -69,14 +112,20 @@ class ValidatorAgent:
             )
         return errors
 
+    def _is_numeric_normalized(self, data: Dict[str, Any]) -> bool:
+        # parser output already carries floats everywhere; nothing to convert then
+        return all(isinstance(data.get(field), float) for field in _TOTAL_FIELDS) and all(
+            isinstance(item.get(field), float)
+            for item in data.get("line_items", ())
+            for field in _LINE_ITEM_NUMERIC_FIELDS
+        )
+
     def normalize(self, data: Dict[str, Any]) -> Dict[str, Any]:
         normalized = data.copy()
         # Normalize date
         try:
             if "date" in normalized:
-                parsed_date = datetime.fromisoformat(
-                    str(normalized["date"]).replace("/", "-")
-                )
+                parsed_date = datetime.fromisoformat(str(normalized["date"]).translate(_DATE_SEP))
                 normalized["date"] = parsed_date.strftime("%Y-%m-%d")
         except Exception:
             pass
@@ -85,18 +134,25 @@ class ValidatorAgent:
         if "vendor" in normalized and isinstance(normalized["vendor"], str):
             normalized["vendor"] = normalized["vendor"].strip()
 
-        # Normalize line items
+        if self._is_numeric_normalized(normalized):
+            return normalized
+
+        # Normalize line items (converted on copies, so the caller's dicts are untouched)
         if "line_items" in normalized:
+            line_items = []
             for item in normalized["line_items"]:
+                item = item.copy()
                 if "quantity" in item:
                     item["quantity"] = float(item["quantity"])
                 if "unit_price" in item:
                     item["unit_price"] = float(item["unit_price"])
                 if "total" in item:
                     item["total"] = float(item["total"])
+                line_items.append(item)
+            normalized["line_items"] = line_items
 
         # Normalize totals
-        for field in ["subtotal", "tax", "total"]:
+        for field in _TOTAL_FIELDS:
             if field in normalized:
                 normalized[field] = float(normalized[field])
 
@@ -109,7 +165,7 @@ class ValidatorAgent:
             errors.append("Missing invoice date")
             return errors
         try:
-            parsed = datetime.fromisoformat(str(invoice_date).replace("/", "-"))
+            parsed = datetime.fromisoformat(str(invoice_date).translate(_DATE_SEP))
             if parsed.date() > datetime.now().date():
                 errors.append(f"Invoice date {invoice_date} is in the future")
         except Exception:
@@ -203,11 +259,16 @@ class ValidatorAgent:
 
         return result
 
-    def handle_coral(self, envelope: Dict[str, Any]) -> Dict[str, Any]:
-        intent = envelope.get("type")
-        sender = envelope.get("from")
+    def run_batch(self, invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        run_data for each invoice, in order.
+        """
+        return [self.run_data(data) for data in invoices]
+
+    def handle_coral(self, envelope: Union[Dict[str, Any], Envelope]) -> Dict[str, Any]:
+        msg_id, intent, sender, body = unpack_envelope(envelope)
         resp = {
-            "id": f"resp-{envelope.get('id')}",
+            "id": f"resp-{msg_id}",
             "type": f"{intent}.response",
             "from": self.id,
             "to": sender,
@@ -216,7 +277,7 @@ class ValidatorAgent:
         }
 
         if intent == "validate.invoice":
-            invoice = envelope.get("body", {}).get("invoice")
+            invoice = body.get("invoice")
             if not invoice:
                 resp["body"] = {"status": "FAIL", "error": "Missing invoice payload"}
                 return resp
@@ -225,3 +286,7 @@ class ValidatorAgent:
 
         resp["body"] = {"status": "FAIL", "error": f"unsupported intent {intent}"}
         return resp
+
+    def handle_coral_bytes(self, raw: bytes) -> bytes:
+        # broker boundary: JSON bytes in, JSON bytes out, no intermediate request dict
+        return dumps_envelope(self.handle_coral(decode_envelope(raw)))
@@ -0,0 +1,33 @@
+"""Add ocr_cache
+
+Revision ID: 5b7e2c9d41a3
+Revises: 14c098429786
+Create Date: 2026-10-14 09:12:31.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c9d41a3'
+down_revision: Union[str, Sequence[str], None] = '14c098429786'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ocr_cache',
+    sa.Column('hash', sa.String(length=32), nullable=False),
+    sa.Column('invoice_text', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ocr_cache')
@@ -0,0 +1,30 @@
+"""Index invoice owner lookups
+
+Revision ID: 9c4d1f7a2e60
+Revises: 5b7e2c9d41a3
+Create Date: 2026-10-14 10:03:47.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4d1f7a2e60'
+down_revision: Union[str, Sequence[str], None] = '5b7e2c9d41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_invoices_owner_id'), 'invoices', ['owner_id'], unique=False)
+    op.create_index('ix_invoices_owner_uploaded', 'invoices', ['owner_id', 'uploaded_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_invoices_owner_uploaded', table_name='invoices')
+    op.drop_index(op.f('ix_invoices_owner_id'), table_name='invoices')
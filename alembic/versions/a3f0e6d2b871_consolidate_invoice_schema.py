@@ -0,0 +1,115 @@
+"""Consolidate invoice schema onto user_id and exports
+
+owner_id becomes user_id (NOT NULL), so the upgrade refuses to run while any
+invoice has no owner; assign or delete those rows first. The dropped total
+column is kept in the new normalized_json column, together with vendor and date,
+and export_path moves to one exports row per invoice.
+
+Revision ID: a3f0e6d2b871
+Revises: 9c4d1f7a2e60
+Create Date: 2026-10-14 15:27:09.904318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f0e6d2b871'
+down_revision: Union[str, Sequence[str], None] = '9c4d1f7a2e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # checked before any DDL, since sqlite DDL here isn't rolled back on failure
+    ownerless = op.get_bind().execute(sa.text("SELECT COUNT(*) FROM invoices WHERE owner_id IS NULL")).scalar()
+    if ownerless:
+        raise RuntimeError(f"{ownerless} invoice(s) have no owner_id; assign or delete them before upgrading")
+
+    op.create_table('exports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('invoice_id', sa.Integer(), nullable=False),
+    sa.Column('export_format', sa.String(length=20), nullable=False),
+    sa.Column('export_path', sa.String(length=1024), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_exports_id'), 'exports', ['id'], unique=False)
+    op.create_index(op.f('ix_exports_invoice_id'), 'exports', ['invoice_id'], unique=False)
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('invoice_number', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('raw_file', sa.String(length=1024), nullable=True))
+        batch_op.add_column(sa.Column('normalized_json', sa.Text(), nullable=True))
+        batch_op.add_column(
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True)
+        )
+
+    # carry existing rows over; total only survives inside normalized_json
+    op.execute(
+        "UPDATE invoices SET user_id = owner_id, raw_file = filename, created_at = uploaded_at, "
+        "normalized_json = json_object('vendor', vendor, 'date', date, 'total', total)"
+    )
+    op.execute(
+        "INSERT INTO exports (invoice_id, export_format, export_path, created_at) "
+        "SELECT id, CASE WHEN export_path LIKE 'http%' THEN 'gsheets' "
+        "WHEN export_path LIKE '%.xlsx' THEN 'xlsx' ELSE 'csv' END, "
+        "export_path, uploaded_at FROM invoices WHERE export_path IS NOT NULL"
+    )
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_index('ix_invoices_owner_uploaded')
+        batch_op.drop_index(op.f('ix_invoices_owner_id'))
+        batch_op.drop_column('owner_id')
+        batch_op.drop_column('filename')
+        batch_op.drop_column('total')
+        batch_op.drop_column('export_path')
+        batch_op.drop_column('uploaded_at')
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('raw_file', existing_type=sa.String(length=1024), nullable=False)
+        batch_op.create_foreign_key('fk_invoices_user_id_users', 'users', ['user_id'], ['id'])
+        batch_op.create_index(op.f('ix_invoices_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(op.f('ix_invoices_invoice_number'), ['invoice_number'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.add_column(sa.Column('owner_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('filename', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('total', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('export_path', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('uploaded_at', sa.DateTime(), nullable=True))
+
+    op.execute(
+        "UPDATE invoices SET owner_id = user_id, filename = raw_file, uploaded_at = created_at, "
+        "total = json_extract(normalized_json, '$.total')"
+    )
+    op.execute(
+        "UPDATE invoices SET export_path = "
+        "(SELECT export_path FROM exports WHERE exports.invoice_id = invoices.id ORDER BY exports.id DESC LIMIT 1)"
+    )
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_index(op.f('ix_invoices_invoice_number'))
+        batch_op.drop_index(op.f('ix_invoices_user_id'))
+        batch_op.drop_constraint('fk_invoices_user_id_users', type_='foreignkey')
+        batch_op.drop_column('created_at')
+        batch_op.drop_column('normalized_json')
+        batch_op.drop_column('raw_file')
+        batch_op.drop_column('invoice_number')
+        batch_op.drop_column('user_id')
+        batch_op.alter_column('filename', existing_type=sa.String(), nullable=False)
+        batch_op.create_foreign_key('fk_invoices_owner_id_users', 'users', ['owner_id'], ['id'])
+        batch_op.create_index(op.f('ix_invoices_owner_id'), ['owner_id'], unique=False)
+        batch_op.create_index('ix_invoices_owner_uploaded', ['owner_id', 'uploaded_at'], unique=False)
+
+    op.drop_index(op.f('ix_exports_invoice_id'), table_name='exports')
+    op.drop_index(op.f('ix_exports_id'), table_name='exports')
+    op.drop_table('exports')
@@ -0,0 +1,22 @@
+# api/agents_registry.py
+"""
+One set of pipeline agents per process, kept on app.state.
+Built at startup rather than import time so every router shares the same warm instances.
+"""
+
+from fastapi import FastAPI
+
+from agents.ocr_agent import OCRAgent
+from agents.parser_agent import ParserAgent
+from agents.validator_agent import ValidatorAgent
+from agents.exporter_agent import ExporterAgent
+from api.ocr_batcher import OCRBatcher
+from settings import OUTPUT_DIR
+
+
+def init_agents(app: FastAPI) -> None:
+    app.state.ocr = OCRAgent()
+    app.state.ocr_batcher = OCRBatcher(app.state.ocr)
+    app.state.parser = ParserAgent()
+    app.state.validator = ValidatorAgent()
+    app.state.exporter = ExporterAgent(export_dir=str(OUTPUT_DIR))
@@ -2,26 +2,43 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, EmailStr, model_validator
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+from cachetools import TTLCache
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import hmac
+import threading
+import time
+import jwt
 
 
 # Local imports
-from database.db_session import get_db, SessionLocal
+from database.db_session import get_db
 from database.models import User
 from settings import JWT_SECRET, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
+# HMAC key material for JWTs and the verify cache, encoded once
+_JWT_KEY = JWT_SECRET.encode("utf-8")
+
 # Password encryption setup
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+# Recent verify_password outcomes, keyed by an HMAC of (password, stored hash) so no
+# password bytes are kept. The stored hash is part of the key, so a password change
+# never hits a stale entry. Failures expire quickly to avoid widening a guessing window.
+_verified_ok = TTLCache(maxsize=10000, ttl=60)
+_verified_bad = TTLCache(maxsize=10000, ttl=5)
+_verified_lock = threading.Lock()
+
 
 # Router for authentication endpoints
 router = APIRouter(tags=["auth"])
 
 # OAuth2 setup for FastAPI dependency injection
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/signin")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/signin")
 
 
 # ------------------------------
@@ -56,7 +73,17 @@ def one_identifier(cls, values):
 # Utility functions
 # ------------------------------
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    key = hmac.digest(_JWT_KEY, f"{plain_password}\0{hashed_password}".encode("utf-8"), "sha256")
+    with _verified_lock:
+        if key in _verified_ok:
+            return True
+        if key in _verified_bad:
+            return False
+
+    ok = pwd_context.verify(plain_password, hashed_password)
+    with _verified_lock:
+        (_verified_ok if ok else _verified_bad)[key] = True
+    return ok
 
 
 def get_password_hash(password):
@@ -67,37 +94,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
+@lru_cache(maxsize=4096)
+def _decode_token(token: str) -> dict:
+    # tokens are immutable, so a verified payload can be reused; failures raise and are not cached
+    return jwt.decode(token, _JWT_KEY, algorithms=[JWT_ALGORITHM])
+
+
 # ------------------------------
 # Routes
 # ------------------------------
 @router.post("/signup", response_model=Token)
-def signup(payload: SignupIn, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter((User.username == payload.username) | (User.email == payload.email)).first()
+async def signup(payload: SignupIn, db: AsyncSession = Depends(get_db)):
+    # only the id is selected: enough to reject a duplicate without hydrating a User
+    result = await db.execute(select(User.id).where(or_(User.username == payload.username, User.email == payload.email)))
+    existing_user = result.first()
 
     if existing_user:
         raise HTTPException(status_code=400, detail="Username or email already registered")
 
-    user = User(username=payload.username, email=payload.email, hashed_password=get_password_hash(payload.password))
+    # argon2 hashing is CPU-bound; keep it off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, payload.password)
+    user = User(username=payload.username, email=payload.email, hashed_password=hashed_password)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
 
     token = create_access_token({"sub": user.username, "user_id": user.id})
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.post("/signin", response_model=Token)
-def signin(payload: SignInIn, db: Session = Depends(get_db)):
+async def signin(payload: SignInIn, db: AsyncSession = Depends(get_db)):
+    # select just the columns needed to verify and issue the token
+    query = select(User.id, User.username, User.hashed_password)
     if payload.email:
-        user = db.query(User).filter(User.email == payload.email).first()
+        query = query.where(User.email == payload.email)
     else:
-        user = db.query(User).filter(User.username == payload.username).first()
+        query = query.where(User.username == payload.username)
+    user = (await db.execute(query)).first()
 
-    if not user or not verify_password(payload.password, user.hashed_password):
+    if not user or not await asyncio.to_thread(verify_password, payload.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token({"sub": user.username, "user_id": user.id})
@@ -107,7 +146,7 @@ def signin(payload: SignInIn, db: Session = Depends(get_db)):
 # ------------------------------
 # Current user dependency
 # ------------------------------
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -115,17 +154,20 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
 
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = _decode_token(token)
+        # a cached payload skips jwt.decode's own expiry check, so repeat it here
+        if payload.get("exp", 0) <= time.time():
+            raise credentials_exception
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
 
         if username is None or user_id is None:
             raise credentials_exception
 
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
 
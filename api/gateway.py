@@ -1,34 +1,36 @@
 # api/gateway.py
-from database.db_session import SessionLocal
-
 import os
-import shutil
 import logging
-import json
+import orjson
+import asyncio
+import uuid
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query
 from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
-from typing import Dict
+from typing import Dict, Optional
 from fastapi.middleware.cors import CORSMiddleware
 
-from models import Invoice, Export
 from settings import UPLOAD_DIR, OUTPUT_DIR
 
-from database.db_session import engine
-from database.models import Base
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from database.db_session import AsyncSessionLocal, engine, get_db
+from database.models import Base, Invoice, Export, OcrCache
 
 from api.invoice_routes import router as invoice_router
+from api.uploads import save_upload_file, file_digest
+from api.throttling import call_exporter, retry
 
 
 # agents and coral
-from agents.coral_utils import make_message
-from agents.ocr_agent import OCRAgent
-from agents.parser_agent import ParserAgent
-from agents.validator_agent import ValidatorAgent
-from agents.exporter_agent import ExporterAgent
+from agents.envelope import envelope_template, stamp
+from api.agents_registry import init_agents
 
 # auth
 from api.auth import router as auth_router, get_current_user
@@ -51,22 +53,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
-app.include_router(auth_router)
 app.include_router(invoice_router)
 
-# Instantiate agents
-ocr = OCRAgent()
-parser = ParserAgent()
-validator = ValidatorAgent()
-exporter = ExporterAgent(export_dir=str(OUTPUT_DIR))
-
+# Coral message templates; each request stamps in a fresh id, timestamp and body
+_OCR_MSG = envelope_template("ocr.extract", sender="api-gateway", recipient="ocr-agent")
+_PARSER_MSG = envelope_template("parser.parse_text", sender="api-gateway", recipient="parser-agent")
+_VALIDATE_MSG = envelope_template("validate.invoice", sender="api-gateway", recipient="validator-agent")
+_EXPORT_MSG = envelope_template("export.invoice", sender="api-gateway", recipient="exporter-agent")
 
 # ensure directories
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
+@app.on_event("startup")
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@app.on_event("startup")
+def create_agents():
+    init_agents(app)
+
+
+@app.on_event("shutdown")
+async def stop_ocr_batcher():
+    await app.state.ocr_batcher.close()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -87,123 +102,126 @@ def health():
     return {"status": "ok"}
 
 
-def save_upload_file(upload_file: UploadFile, destination: str) -> None:
-    with open(destination, "wb") as f:
-        shutil.copyfileobj(upload_file.file, f)
+async def _cached_ocr_text(db: AsyncSession, digest: str) -> Optional[str]:
+    hit = await db.get(OcrCache, digest)
+    return hit.invoice_text if hit else None
+
+
+async def _store_ocr_text(digest: str, invoice_text: str) -> None:
+    # own short session, so a failure here never rolls back (and expires) the request's session;
+    # concurrent uploads of the same bytes race to insert the same hash, and the first one wins
+    stmt = sqlite_insert(OcrCache).values(hash=digest, invoice_text=invoice_text).on_conflict_do_nothing(index_elements=["hash"])
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+    except Exception:
+        logger.exception("Failed to store OCR cache entry %s", digest)
+
+
+async def _save_invoice(db: AsyncSession, user_id: int, normalized: Dict, saved_path: str, export_body: Dict, export_format: str) -> None:
+    """
+    Insert the invoice, plus its export row if the exporter succeeded, in one short write transaction.
+    """
+    inv = Invoice(
+        user_id=user_id,
+        invoice_number=normalized.get("invoice_number"),
+        vendor=normalized.get("vendor"),
+        date=normalized.get("date"),
+        raw_file=saved_path,
+        normalized_json=orjson.dumps(normalized).decode(),
+    )
+    if export_body.get("status") == "PASS":
+        inv.exports.append(Export(export_format=export_body.get("format", export_format), export_path=export_body.get("file")))
+    db.add(inv)
+    await db.commit()
 
 
 @app.post("/process_invoice")
 async def process_invoice(
+    request: Request,
     file: UploadFile = File(...),
     export_format: str = Form("csv"),
+    db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
     Protected endpoint: user must be authenticated (JWT).
     """
+    agents = request.app.state
+    # read once up front: a rollback on db would expire current_user and make later access lazy-load
+    user_id = current_user.id
     # save file
     filename = os.path.basename(file.filename or "uploaded_invoice")
-    saved_path = os.path.join(UPLOAD_DIR, f"{current_user.id}_{filename}")
-    save_upload_file(file, saved_path)
+    saved_path = os.path.join(UPLOAD_DIR, f"{user_id}_{filename}")
+    await save_upload_file(file, saved_path)
     logger.info("Saved uploaded file: %s", saved_path)
 
-    # OCR
-    ocr_msg = make_message(
-        "ocr.extract", sender="api-gateway", recipient="ocr-agent", body={"file_info": {"filename": filename, "path": saved_path}}
-    )
-    ocr_resp = ocr.handle_coral(ocr_msg)
-    invoice_text = ocr_resp.get("body", {}).get("invoice_text")
-    if not invoice_text:
-        raise HTTPException(status_code=400, detail="OCR failed")
+    # OCR, skipped when identical file contents were OCR'd before
+    digest = await asyncio.to_thread(file_digest, saved_path)
+    invoice_text = await _cached_ocr_text(db, digest)
+    if invoice_text is None:
+        ocr_msg = stamp(_OCR_MSG, {"file_info": {"filename": filename, "path": saved_path}})
+        ocr_resp = await retry(agents.ocr_batcher.submit, ocr_msg)
+        invoice_text = ocr_resp.get("body", {}).get("invoice_text")
+        if not invoice_text:
+            raise HTTPException(status_code=400, detail="OCR failed")
+        await _store_ocr_text(digest, invoice_text)
 
     # Parser
-    parser_msg = make_message("parser.parse_text", sender="api-gateway", recipient="parser-agent", body={"invoice_text": invoice_text})
-    parser_resp = parser.handle_coral(parser_msg)
+    parser_msg = stamp(_PARSER_MSG, {"invoice_text": invoice_text})
+    parser_resp = await asyncio.to_thread(agents.parser.handle_coral, parser_msg)
     invoice = parser_resp.get("body", {}).get("invoice")
     if not invoice:
         raise HTTPException(status_code=400, detail="Parsing failed")
 
     # Validator
-    val_msg = make_message("validate.invoice", sender="api-gateway", recipient="validator-agent", body={"invoice": invoice})
-    val_resp = validator.handle_coral(val_msg)
+    val_msg = stamp(_VALIDATE_MSG, {"invoice": invoice})
+    val_resp = await asyncio.to_thread(agents.validator.handle_coral, val_msg)
     val_body = val_resp.get("body", {})
     if val_body.get("status") != "PASS" or not val_body.get("valid", False):
         return JSONResponse({"status": "FAIL", "validation": val_body}, status_code=400)
 
     normalized = val_body.get("normalized_data") or invoice
 
-    # Save invoice record to DB
-    db = SessionLocal()
+    # Export first, before any write: the sqlite write lock is never held across exporter I/O or retry backoff.
+    # invoice_id is only the exporter's filename fallback when there is no invoice number.
+    fmt = (export_format or "csv").lower()
+    export_msg = stamp(_EXPORT_MSG, {"invoice": normalized, "format": fmt, "invoice_id": uuid.uuid4().hex[:12]})
+    export_resp = await call_exporter(agents.exporter, export_msg, fmt)
+    export_body = export_resp.get("body", {})
+    export_ok = export_body.get("status") == "PASS"
+
+    # Save the invoice record; the invoice is kept even when the exporter failed
     try:
-        inv = Invoice(
-            user_id=current_user.id,
-            invoice_number=normalized.get("invoice_number"),
-            vendor=normalized.get("vendor"),
-            date=normalized.get("date"),
-            raw_file=saved_path,
-            normalized_json=json.dumps(normalized),
-        )
-        db.add(inv)
-        db.commit()
-        db.refresh(inv)
+        await _save_invoice(db, user_id, normalized, saved_path, export_body, export_format)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"DB error: {e}")
 
-    # Export
-    export_msg = make_message(
-        "export.invoice",
-        sender="api-gateway",
-        recipient="exporter-agent",
-        body={"invoice": normalized, "format": (export_format or "csv").lower(), "invoice_id": inv.id},
-    )
-    export_resp = exporter.handle_coral(export_msg)
-    export_body = export_resp.get("body", {})
-
-    # If exporter succeeded, record export in DB
-    if export_body.get("status") == "PASS":
-        try:
-            ex = Export(invoice_id=inv.id, export_format=export_body.get("format", export_format), export_path=export_body.get("file"))
-            db.add(ex)
-            db.commit()
-            db.refresh(ex)
-        except Exception as e:
-            db.rollback()
-            logger.exception("Failed to record export: %s", e)
-    else:
+    if not export_ok:
         # exporter failed
         return JSONResponse({"status": "FAIL", "export": export_body}, status_code=500)
-    db.close()
 
     return JSONResponse({"status": "OK", "export": export_body})
 
-    # 6. Save to database
-    db = SessionLocal()
-    try:
-        inv_record = Invoice(
-            filename=filename,
-            total=normalized.get("total"),
-            vendor=normalized.get("vendor"),
-            date=normalized.get("date"),
-            export_path=export_body.get("file"),
-        )
-        db.add(inv_record)
-        db.commit()
-    except Exception as e:
-        logger.error(f"Failed to save invoice record: {e}")
-        db.rollback()
-    finally:
-        db.close()
-
-    # 7. Success
-    result = {"status": "OK", "export": export_body}
-    return JSONResponse(result)
-
 
 @app.get("/invoices")
-def list_invoices(current_user=Depends(get_current_user)):
-    db = SessionLocal()
-    rows = db.query(Invoice).filter(Invoice.user_id == current_user.id).order_by(Invoice.created_at.desc()).all()
+async def list_invoices(
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Newest-first page of the user's invoices. Pass the returned next_cursor as before_id for the next page.
+    """
+    # keyset pagination on the primary key; exports for the page come back in one extra IN query
+    query = select(Invoice).options(selectinload(Invoice.exports)).where(Invoice.user_id == current_user.id)
+    if before_id is not None:
+        query = query.where(Invoice.id < before_id)
+    result = await db.execute(query.order_by(Invoice.id.desc()).limit(limit))
+    rows = result.scalars().all()
     results = []
     for r in rows:
         latest_export = r.exports[-1] if r.exports else None
@@ -223,30 +241,41 @@ def list_invoices(current_user=Depends(get_current_user)):
                 "created_at": str(r.created_at),
             }
         )
-    db.close()
-    return {"invoices": results}
+    # a short page means there is nothing older to fetch
+    next_cursor = rows[-1].id if len(rows) == limit else None
+    return {"invoices": results, "next_cursor": next_cursor}
 
 
-@app.get("/download/{export_id}")
-def download_export(export_id: int, current_user=Depends(get_current_user)):
-    db = SessionLocal()
-    ex = db.query(Export).filter(Export.id == export_id).first()
-    if not ex:
+async def _lookup_export(db: AsyncSession, export_id: int, user_id: int) -> Export:
+    result = await db.execute(
+        select(Export, Invoice.user_id).join(Invoice, Export.invoice_id == Invoice.id).where(Export.id == export_id)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Export not found")
-    inv = db.query(Invoice).filter(Invoice.id == ex.invoice_id).first()
-    if inv.user_id != current_user.id:
+    ex, owner_id = row
+    if owner_id != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
-    db.close()
+    return ex
+
+
+@app.api_route("/download/{export_id}", methods=["GET", "HEAD"])
+async def download_export(export_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    ex = await _lookup_export(db, export_id, current_user.id)
 
     if ex.export_format == "gsheets":
         # return sheets URL
         return {"url": ex.export_path}
-    # else local file
-    if not ex.export_path or not os.path.exists(ex.export_path):
+    # else local file; one stat serves both the existence check and the response headers
+    try:
+        stat = os.stat(ex.export_path) if ex.export_path else None
+    except OSError:
+        stat = None
+    if stat is None:
         raise HTTPException(status_code=404, detail="Export file not found")
-    return FileResponse(path=ex.export_path, filename=os.path.basename(ex.export_path), media_type="application/octet-stream")
-
-
-@app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, user=Depends(get_current_user)):
-    return templates.TemplateResponse("dashboard.html", {"request": request, "user": user})
+    return FileResponse(
+        path=ex.export_path,
+        filename=os.path.basename(ex.export_path),
+        stat_result=stat,
+        media_type="application/octet-stream",
+    )
@@ -1,19 +1,19 @@
 import os
-import shutil
 import logging
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+import orjson
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from database.db_session import get_db
-from database.models import Invoice
+from database.models import Invoice, Export
 from api.auth import get_current_user
-from agents.ocr_agent import OCRAgent
-from agents.parser_agent import ParserAgent
-from agents.validator_agent import ValidatorAgent
-from agents.exporter_agent import ExporterAgent
-from agents.coral_utils import make_message
+from api.uploads import save_upload_file
+from api.throttling import call_exporter, retry
+from agents.envelope import envelope_template, stamp
 
 # Logging
 logger = logging.getLogger("api.invoices")
@@ -22,72 +22,52 @@ router = APIRouter(prefix="/invoices", tags=["invoices"])
 # Directories
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 UPLOAD_DIR = os.path.join(PROJECT_ROOT, "data", "input")
-EXPORT_DIR = os.path.join(PROJECT_ROOT, "data", "output")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(EXPORT_DIR, exist_ok=True)
 
-# Instantiate agents
-ocr = OCRAgent()
-parser = ParserAgent()
-validator = ValidatorAgent()
-exporter = ExporterAgent(export_dir=EXPORT_DIR)
-
-
-def save_upload_file(upload_file: UploadFile, destination: str):
-    with open(destination, "wb") as f:
-        shutil.copyfileobj(upload_file.file, f)
+# Coral message templates; each request stamps in a fresh id, timestamp and body
+_OCR_MSG = envelope_template("ocr.extract", sender="invoice-endpoint", recipient="ocr-agent")
+_PARSER_MSG = envelope_template("parser.parse_text", sender="invoice-endpoint", recipient="parser-agent")
+_VALIDATE_MSG = envelope_template("validate.invoice", sender="invoice-endpoint", recipient="validator-agent")
+_EXPORT_MSG = envelope_template("export.invoice", sender="invoice-endpoint", recipient="exporter-agent")
 
 
 @router.post("/upload")
 async def upload_invoice(
+    request: Request,
     file: UploadFile = File(...),
     export_format: str = Form("csv"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(get_current_user),
 ):
+    agents = request.app.state
     filename = os.path.basename(file.filename or "uploaded_invoice")
     saved_path = os.path.join(UPLOAD_DIR, filename)
 
     try:
-        save_upload_file(file, saved_path)
+        await save_upload_file(file, saved_path)
     except Exception as e:
         logger.exception("Error saving file")
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
 
     # OCR
-    ocr_msg = make_message(
-        msg_type="ocr.extract",
-        sender="invoice-endpoint",
-        recipient="ocr-agent",
-        body={"file_info": {"filename": filename, "path": saved_path}},
-    )
-    ocr_resp = ocr.handle_coral(ocr_msg)
+    ocr_msg = stamp(_OCR_MSG, {"file_info": {"filename": filename, "path": saved_path}})
+    ocr_resp = await retry(agents.ocr_batcher.submit, ocr_msg)
     invoice_text = ocr_resp.get("body", {}).get("invoice_text")
 
     if not invoice_text:
         raise HTTPException(status_code=400, detail="OCR extraction failed")
 
     # Parser
-    parser_msg = make_message(
-        msg_type="parser.parse_text",
-        sender="invoice-endpoint",
-        recipient="parser-agent",
-        body={"invoice_text": invoice_text},
-    )
-    parser_resp = parser.handle_coral(parser_msg)
+    parser_msg = stamp(_PARSER_MSG, {"invoice_text": invoice_text})
+    parser_resp = await asyncio.to_thread(agents.parser.handle_coral, parser_msg)
     invoice_data = parser_resp.get("body", {}).get("invoice")
 
     if not invoice_data:
         raise HTTPException(status_code=400, detail="Parsing failed")
 
     # Validator
-    val_msg = make_message(
-        msg_type="validate.invoice",
-        sender="invoice-endpoint",
-        recipient="validator-agent",
-        body={"invoice": invoice_data},
-    )
-    val_resp = validator.handle_coral(val_msg)
+    val_msg = stamp(_VALIDATE_MSG, {"invoice": invoice_data})
+    val_resp = await asyncio.to_thread(agents.validator.handle_coral, val_msg)
     val_body = val_resp.get("body", {})
 
     if val_body.get("status") != "PASS":
@@ -96,55 +76,61 @@ async def upload_invoice(
     normalized = val_body.get("normalized_data") or invoice_data
 
     # Export
-    export_msg = make_message(
-        msg_type="export.invoice",
-        sender="invoice-endpoint",
-        recipient="exporter-agent",
-        body={"invoice": normalized, "format": export_format.lower()},
-    )
-    export_resp = exporter.handle_coral(export_msg)
+    fmt = export_format.lower()
+    export_msg = stamp(_EXPORT_MSG, {"invoice": normalized, "format": fmt})
+    export_resp = await call_exporter(agents.exporter, export_msg, fmt)
     export_body = export_resp.get("body", {})
-    export_path = export_body.get("path")
+    export_path = export_body.get("file")
 
     # Save to database
     invoice = Invoice(
-        filename=filename,
-        file_path=saved_path,
-        export_path=export_path,
+        user_id=user.id,
+        invoice_number=normalized.get("invoice_number"),
         vendor=normalized.get("vendor"),
-        invoice_date=normalized.get("date"),
-        subtotal=normalized.get("subtotal"),
-        tax=normalized.get("tax"),
-        total=normalized.get("total"),
-        data=normalized,
-        owner_id=user.id,
+        date=normalized.get("date"),
+        raw_file=saved_path,
+        normalized_json=orjson.dumps(normalized).decode(),
     )
+    if export_body.get("status") == "PASS":
+        invoice.exports.append(Export(export_format=export_body.get("format", export_format), export_path=export_path))
     db.add(invoice)
-    db.commit()
-    db.refresh(invoice)
+    await db.commit()
 
     return JSONResponse({"status": "OK", "invoice_id": invoice.id, "export_path": export_path})
 
 
 @router.get("/history")
-def get_invoice_history(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    invoices = db.query(Invoice).filter(Invoice.owner_id == user.id).all()
-    return invoices
+async def get_invoice_history(
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    query = select(Invoice).where(Invoice.user_id == user.id)
+    if before_id is not None:
+        query = query.where(Invoice.id < before_id)
+    result = await db.execute(query.order_by(Invoice.id.desc()).limit(limit))
+    invoices = result.scalars().all()
+    next_cursor = invoices[-1].id if len(invoices) == limit else None
+    return {"invoices": invoices, "next_cursor": next_cursor}
 
 
 @router.get("/{invoice_id}")
-def get_invoice(invoice_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.owner_id == user.id).first()
+async def get_invoice(invoice_id: int, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    result = await db.execute(select(Invoice).where(Invoice.id == invoice_id, Invoice.user_id == user.id))
+    invoice = result.scalars().first()
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     return invoice
 
 
 @router.delete("/{invoice_id}")
-def delete_invoice(invoice_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    invoice = db.query(Invoice).filter(Invoice.id == invoice_id, Invoice.owner_id == user.id).first()
-    if not invoice:
+async def delete_invoice(invoice_id: int, db: AsyncSession = Depends(get_db), user=Depends(get_current_user)):
+    result = await db.execute(select(Invoice.id).where(Invoice.id == invoice_id, Invoice.user_id == user.id))
+    if not result.first():
         raise HTTPException(status_code=404, detail="Invoice not found")
-    db.delete(invoice)
-    db.commit()
+    # exports reference the invoice with a NOT NULL key, so they go first
+    await db.execute(delete(Export).where(Export.invoice_id == invoice_id))
+    await db.execute(delete(Invoice).where(Invoice.id == invoice_id))
+    await db.commit()
     return {"status": "deleted", "invoice_id": invoice_id}
@@ -0,0 +1,91 @@
+# api/ocr_batcher.py
+"""
+Micro-batching for the OCR stage.
+Requests that reach OCR within OCR_MAX_BATCH_DELAY_MS of each other are sent to the
+agent as one handle_coral_batch call, then each caller gets its own response back.
+Agents without supports_batch skip the queue and the collection delay entirely.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from agents.envelope import Envelope
+from api.throttling import call_ocr_batch
+from settings import OCR_MAX_BATCH, OCR_MAX_BATCH_DELAY_MS
+
+logger = logging.getLogger("api.ocr_batcher")
+
+
+class OCRBatcher:
+    def __init__(self, agent, max_batch: int = OCR_MAX_BATCH, max_delay_ms: float = OCR_MAX_BATCH_DELAY_MS):
+        self.agent = agent
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._runner: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def submit(self, msg: Union[Dict[str, Any], Envelope]) -> Dict[str, Any]:
+        """
+        Queue an ocr.extract message and wait for its response.
+        """
+        if not getattr(self.agent, "supports_batch", False):
+            (resp,) = await call_ocr_batch(self.agent, [msg])
+            return resp
+        if self._runner is None or self._runner.done():
+            # started on first use so it binds to the serving event loop
+            self._runner = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((msg, fut))
+        return await fut
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # dispatch without waiting, so several batches can be in flight up to the OCR semaphore
+            task = asyncio.create_task(self._dispatch(items))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, items: List[Tuple[Union[Dict[str, Any], Envelope], asyncio.Future]]) -> None:
+        try:
+            results = await call_ocr_batch(self.agent, [msg for msg, _ in items])
+        except Exception:
+            logger.exception("OCR batch of %d failed, retrying its messages one by one", len(items))
+            await asyncio.gather(*(self._dispatch_one(msg, fut) for msg, fut in items))
+            return
+        for (_, fut), resp in zip(items, results):
+            if not fut.done():
+                fut.set_result(resp)
+        if len(results) != len(items):
+            logger.error("OCR batch returned %d results for %d messages", len(results), len(items))
+            for _, fut in items[len(results):]:
+                if not fut.done():
+                    fut.set_exception(RuntimeError("OCR batch returned too few results"))
+
+    async def _dispatch_one(self, msg: Union[Dict[str, Any], Envelope], fut: asyncio.Future) -> None:
+        # isolates a failed batch's messages so only the bad one fails
+        try:
+            (resp,) = await call_ocr_batch(self.agent, [msg])
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(resp)
@@ -0,0 +1,91 @@
+# api/throttling.py
+"""
+Backpressure and retry for the upload pipeline's external stages, shared by every upload route.
+A semaphore caps in-flight OCR (batch) calls and a minimum-interval limiter spaces out
+call starts, so bursts of uploads don't hammer the OCR backend into 429s.
+retry() re-runs a stage with exponential backoff when it fails for a transient reason;
+call_exporter() only does so for export formats where a re-run is harmless.
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from settings import OCR_MAX_INFLIGHT, OCR_MIN_INTERVAL
+
+OCR_SEM = asyncio.Semaphore(OCR_MAX_INFLIGHT)
+_ocr_lock = asyncio.Lock()
+_last_ocr_ts = 0.0
+
+
+async def _wait_for_slot() -> None:
+    global _last_ocr_ts
+    async with _ocr_lock:
+        wait = OCR_MIN_INTERVAL - (time.monotonic() - _last_ocr_ts)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _last_ocr_ts = time.monotonic()
+
+
+async def call_ocr_batch(agent, msgs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run agent.handle_coral_batch(msgs) in a worker thread, within the OCR concurrency and rate limits.
+    A whole batch counts as one OCR call.
+    """
+    async with OCR_SEM:
+        if OCR_MIN_INTERVAL > 0:
+            await _wait_for_slot()
+        return await asyncio.to_thread(agent.handle_coral_batch, msgs)
+
+
+# rate-limit / timeout class errors; anything else (bad input, parse errors) fails fast
+_TRANSIENT_RE = re.compile(r"\b429\b|rate.?limit|quota|timed? ?out|temporarily unavailable", re.IGNORECASE)
+
+
+def _is_transient(err: Exception) -> bool:
+    if isinstance(err, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(err, "status_code", None) or getattr(getattr(err, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    return bool(_TRANSIENT_RE.search(str(err)))
+
+
+def _failed_transiently(resp: Dict[str, Any]) -> bool:
+    # agents catch their own exceptions and report them as FAIL bodies
+    body = resp.get("body", {})
+    return body.get("status") == "FAIL" and bool(_TRANSIENT_RE.search(str(body.get("error", ""))))
+
+
+async def retry(
+    fn: Callable[..., Awaitable[Dict[str, Any]]], *args, attempts: int = 3, base: float = 0.5, cap: float = 4.0
+) -> Dict[str, Any]:
+    """
+    Await fn(*args), retrying transient failures with backoff base * 2**i (capped at cap seconds).
+    The last attempt's exception or response is passed through unchanged.
+    """
+    for i in range(attempts):
+        last = i == attempts - 1
+        try:
+            resp = await fn(*args)
+        except Exception as e:
+            if last or not _is_transient(e):
+                raise
+        else:
+            if last or not _failed_transiently(resp):
+                return resp
+        await asyncio.sleep(min(cap, base * (2**i)))
+
+
+# csv/xlsx re-runs overwrite the same file; every gsheets call creates another spreadsheet
+_IDEMPOTENT_EXPORT_FORMATS = frozenset({"csv", "xls", "xlsx", "excel"})
+
+
+async def call_exporter(exporter, msg: Dict[str, Any], fmt: str) -> Dict[str, Any]:
+    """
+    Run exporter.handle_coral(msg) in a worker thread, with retry() only when fmt is safe to repeat.
+    """
+    if fmt in _IDEMPOTENT_EXPORT_FORMATS:
+        return await retry(asyncio.to_thread, exporter.handle_coral, msg)
+    return await asyncio.to_thread(exporter.handle_coral, msg)
@@ -0,0 +1,60 @@
+# api/uploads.py
+"""
+Helpers for persisting uploaded files to disk.
+"""
+
+import asyncio
+import hashlib
+import os
+
+import aiofiles
+from fastapi import UploadFile
+
+# chunk size for the streaming fallback; far fewer read/write syscalls than copyfileobj's 16 KiB
+_COPY_BUFSIZE = 1024 * 1024
+
+
+async def save_upload_file(upload_file: UploadFile, destination: str) -> None:
+    """
+    Write the upload to destination without blocking the event loop.
+    """
+    src = upload_file.file
+    if _on_disk(src):
+        try:
+            await asyncio.to_thread(_sendfile_copy, src, destination)
+            return
+        except (AttributeError, OSError):
+            # no usable fd (non-regular file) or sendfile unsupported
+            pass
+
+    await upload_file.seek(0)
+    async with aiofiles.open(destination, "wb") as out:
+        while chunk := await upload_file.read(_COPY_BUFSIZE):
+            await out.write(chunk)
+
+
+def _on_disk(src) -> bool:
+    # a SpooledTemporaryFile still held in memory would be forced to disk by fileno();
+    # small uploads are cheaper to stream straight from the buffer
+    return getattr(src, "_rolled", True)
+
+
+def _sendfile_copy(src, destination: str) -> None:
+    # kernel-side copy between the two fds; no userspace bounce buffer
+    with open(destination, "wb") as out:
+        in_fd, out_fd = src.fileno(), out.fileno()
+        size = os.fstat(in_fd).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+            if not sent:
+                break
+            offset += sent
+
+
+def file_digest(path: str) -> str:
+    """
+    Content hash of a saved upload (16-byte blake2b, hex), streamed so large scans aren't read into memory.
+    """
+    with open(path, "rb") as fp:
+        return hashlib.file_digest(fp, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
@@ -1,36 +1,58 @@
 # database/db_session.py
 """
 Database session and initialization module.
-Uses SQLite (data/invoices.db) by default.
+Uses SQLite (settings.DB_PATH, data/invoices.db by default) through the aiosqlite async driver.
+This is the project's only engine; every model lives on its Base in database/models.py.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///data/invoices.db"
+from settings import DB_PATH
 
+# sync URL for alembic; the app itself goes through the async engine below
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Connect-event hook applying the sqlite tuning pragmas.
+    """
+    # WAL lets readers run alongside the writer; NORMAL drops the per-commit fsync of FULL
+    # (durable across process crashes, not power loss)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB of the file read via mmap
+    cursor.close()
+
+
+event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+
+
+AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
     Dependency that provides a database session to API routes.
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+async def init_db():
     """
-    Creates all tables in the database according to models.py
+    Creates all tables in the database according to database/models.py
     """
-    from models import Base  # import here to avoid circular imports
+    import database.models  # noqa: F401  (registers the models on Base; imported here to avoid circular imports)
 
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -1,7 +1,8 @@
-# models.py
+# database/models.py
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from datetime import datetime
 from database.db_session import Base
 
@@ -15,19 +16,42 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    invoices = relationship("Invoice", back_populates="owner")
+    invoices = relationship("Invoice", back_populates="user")
 
 
 class Invoice(Base):
     __tablename__ = "invoices"
 
     id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String, nullable=False)
-    total = Column(Float, nullable=True)
-    vendor = Column(String, nullable=True)
-    date = Column(String, nullable=True)
-    export_path = Column(String, nullable=True)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
-
-    owner_id = Column(Integer, ForeignKey("users.id"))
-    owner = relationship("User", back_populates="invoices")
+    # sqlite indexes carry the rowid, so this also serves the per-user, id-ordered listings
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    invoice_number = Column(String(100), index=True, nullable=True)
+    vendor = Column(String(255), nullable=True)
+    date = Column(String(50), nullable=True)
+    raw_file = Column(String(1024), nullable=False)  # path to uploaded file
+    normalized_json = Column(Text, nullable=True)  # JSON string of normalized invoice
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="invoices")
+    exports = relationship("Export", back_populates="invoice", order_by="Export.id")
+
+
+class Export(Base):
+    __tablename__ = "exports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=False, index=True)
+    export_format = Column(String(20), nullable=False)  # csv / xlsx / gsheets
+    export_path = Column(String(1024), nullable=True)  # local path or gsheets url
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    invoice = relationship("Invoice", back_populates="exports")
+
+
+class OcrCache(Base):
+    __tablename__ = "ocr_cache"
+
+    # blake2b (16-byte) hex digest of the uploaded file contents
+    hash = Column(String(32), primary_key=True)
+    invoice_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,20 +0,0 @@
-# db.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
-from settings import DB_PATH
-from sqlalchemy.ext.declarative import declarative_base
-
-SQLITE_URL = f"sqlite:///{DB_PATH}"
-
-engine = create_engine(SQLITE_URL, connect_args={"check_same_thread": False})
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
-
-Base = declarative_base()
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
@@ -1,16 +1,11 @@
 # google_test.py
 import os
-from google.oauth2.service_account import Credentials
-import gspread
-from googleapiclient.discovery import build
+from agents.google_clients import get_gspread_client, get_drive_service
 
 # path to your downloaded JSON key
 SERVICE_FILE = os.getenv("GOOGLE_CREDS_JSON", "service_account.json")
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-
-creds = Credentials.from_service_account_file(SERVICE_FILE, scopes=SCOPES)
-gc = gspread.authorize(creds)
+gc = get_gspread_client(SERVICE_FILE)
 
 # 1) Create new spreadsheet
 title = "Invoice_Test_Sheet"
@@ -29,7 +24,7 @@ worksheet.append_row(["Widget", 1, 50.0, 50.0])
 print("Created sheet:", sh.url)
 
 # 4) As an alternative, set "anyone with link" permission using Drive API:
-drive_service = build("drive", "v3", credentials=creds)
+drive_service = get_drive_service(SERVICE_FILE)
 perm = {"type": "anyone", "role": "writer"}  # or "reader"
 drive_service.permissions().create(fileId=sh.id, body=perm).execute()
 print("Sheet URL (anyone):", f"https://docs.google.com/spreadsheets/d/{sh.id}")
@@ -0,0 +1,18 @@
+# gunicorn_conf.py
+"""
+Production process model for the API gateway:
+    gunicorn -c gunicorn_conf.py api.gateway:app
+
+One uvicorn worker process per core does the CPU-bound OCR/parse/validate work in
+parallel; inside each worker the async pipeline overlaps I/O waits. The total OCR
+budget is workers x OCR_MAX_INFLIGHT, so size OCR_MAX_INFLIGHT per worker.
+"""
+
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+# OCR on large scans can legitimately run long
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
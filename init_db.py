@@ -1,7 +1,8 @@
 # init_db.py
-from db import engine, Base
-from models import User, Invoice, Export
+import asyncio
+
+from database.db_session import init_db
 
 if __name__ == "__main__":
-    Base.metadata.create_all(bind=engine)
+    asyncio.run(init_db())
     print("DB tables created")
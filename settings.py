@@ -9,7 +9,7 @@ PROJECT_ROOT = Path(__file__).parent.resolve()
 DATA_DIR = Path(os.getenv("DATA_DIR", PROJECT_ROOT / "data"))
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", DATA_DIR / "input"))
 OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", DATA_DIR / "output"))
-DB_PATH = os.getenv("DB_PATH", PROJECT_ROOT / "invoice_system.db")
+DB_PATH = os.getenv("DB_PATH", DATA_DIR / "invoices.db")
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-this")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -17,6 +17,13 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
 
 CORAL_SECRET = os.getenv("CORAL_SECRET", "dev-coral-secret")
 
+# OCR backpressure, per worker process: max concurrent OCR calls and minimum spacing (seconds) between call starts
+OCR_MAX_INFLIGHT = int(os.getenv("OCR_MAX_INFLIGHT", "4"))
+OCR_MIN_INTERVAL = float(os.getenv("OCR_MIN_INTERVAL", "0.0"))
+# OCR micro-batching: collect up to OCR_MAX_BATCH uploads, waiting at most OCR_MAX_BATCH_DELAY_MS
+OCR_MAX_BATCH = int(os.getenv("OCR_MAX_BATCH", "8"))
+OCR_MAX_BATCH_DELAY_MS = float(os.getenv("OCR_MAX_BATCH_DELAY_MS", "20"))
+
 # Google service account file for gspread (optional)
 GOOGLE_CREDS_JSON = os.getenv("GOOGLE_CREDS_JSON", "")  # path to credentials.json
 
@@ -0,0 +1,18 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# settings reads these at import time, so point the app at a throwaway data dir before anything imports it
+_DATA_DIR = tempfile.mkdtemp(prefix="invoiceparser-tests-")
+os.environ.setdefault("DATA_DIR", _DATA_DIR)
+os.environ.setdefault("DB_PATH", os.path.join(_DATA_DIR, "invoices.db"))
+
+from api import throttling  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_ocr_semaphore(monkeypatch):
+    # an asyncio.Semaphore binds to the loop it first waits on; each test runs its own loop
+    monkeypatch.setattr(throttling, "OCR_SEM", asyncio.Semaphore(throttling.OCR_MAX_INFLIGHT))
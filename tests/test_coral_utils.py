@@ -0,0 +1,40 @@
+import hmac
+import json
+import math
+
+import pytest
+
+from agents.coral_utils import _serialize_for_signing, sign_message, verify_signature
+
+
+def _legacy(message):
+    # the signing format peers on older versions still produce
+    return json.dumps(message, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"vendor": "Café Müller", "note": "日本語", "emoji": "🧾"},
+        {"text": "line\u2028sep\u2029para", "ctl": "del\x7f tab\t nul\x00"},
+        {"small": 1e-05, "big": 1e16, "bigger": 1e22, "neg": -2.5e-07, "plain": 55.0, "int": 3},
+        {"b": {"z": [1, {"y": None, "x": True}], "a": []}, "a": "first"},
+        {1: "int key", 2: "other int key"},
+        {2.5: "float key", 1e-05: "exponent key"},
+    ],
+)
+def test_signing_payload_matches_legacy_json_dumps(message):
+    assert _serialize_for_signing(message) == _legacy(message)
+
+
+@pytest.mark.parametrize("value", [math.inf, -math.inf, math.nan])
+def test_non_finite_floats_are_rejected(value):
+    with pytest.raises(ValueError):
+        sign_message({"total": value}, "secret")
+
+
+def test_legacy_signature_verifies():
+    message = {"id": "m1", "body": {"vendor": "Café", "tax": 1e-05}}
+    legacy_sig = hmac.new(b"secret", _legacy(message), "sha256").hexdigest()
+    assert verify_signature(message, legacy_sig, "secret")
+    assert not verify_signature({**message, "id": "m2"}, legacy_sig, "secret")
@@ -0,0 +1,33 @@
+import asyncio
+
+import httpx
+
+from api import gateway
+
+
+async def _export_then_download(method):
+    await gateway.create_tables()
+    gateway.create_agents()
+    try:
+        transport = httpx.ASGITransport(app=gateway.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            signup = await client.post(
+                "/auth/signup", json={"username": f"dl-{method}", "email": f"dl-{method}@example.com", "password": "pw"}
+            )
+            headers = {"Authorization": f"Bearer {signup.json()['access_token']}"}
+            files = {"file": ("inv.txt", f"download {method}".encode(), "text/plain")}
+            processed = await client.post("/process_invoice", files=files, data={"export_format": "xlsx"}, headers=headers)
+            assert processed.status_code == 200, processed.text
+            listed = await client.get("/invoices", headers=headers)
+            export_id = listed.json()["invoices"][0]["export"]["id"]
+            return await client.request(method, f"/download/{export_id}", headers=headers)
+    finally:
+        await gateway.app.state.ocr_batcher.close()
+
+
+def test_head_download_returns_headers_without_body():
+    get = asyncio.run(_export_then_download("GET"))
+    head = asyncio.run(_export_then_download("HEAD"))
+    assert get.status_code == head.status_code == 200
+    assert head.content == b""
+    assert int(head.headers["content-length"]) == len(get.content) > 0
@@ -0,0 +1,40 @@
+import asyncio
+
+import httpx
+from sqlalchemy import func, select
+
+from api import gateway
+from database.db_session import AsyncSessionLocal
+from database.models import OcrCache
+
+
+async def _cache_rows():
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(OcrCache))
+
+
+async def _upload_identical_files(n):
+    await gateway.create_tables()
+    gateway.create_agents()
+    before = await _cache_rows()
+    try:
+        transport = httpx.ASGITransport(app=gateway.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            signup = await client.post("/auth/signup", json={"username": "dup", "email": "dup@example.com", "password": "pw"})
+            headers = {"Authorization": f"Bearer {signup.json()['access_token']}"}
+
+            async def upload(i):
+                files = {"file": (f"dup{i}.txt", b"same bytes every time", "text/plain")}
+                return await client.post("/process_invoice", files=files, data={"export_format": "csv"}, headers=headers)
+
+            responses = await asyncio.gather(*(upload(i) for i in range(n)))
+        return responses, await _cache_rows() - before
+    finally:
+        await gateway.app.state.ocr_batcher.close()
+
+
+def test_concurrent_identical_uploads_all_succeed():
+    # every upload misses the cache at once, so they all race to insert the same ocr_cache row
+    responses, new_cache_rows = asyncio.run(_upload_identical_files(8))
+    assert [r.status_code for r in responses] == [200] * 8, [r.text for r in responses if r.status_code != 200]
+    assert new_cache_rows == 1
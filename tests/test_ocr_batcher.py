@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.ocr_agent import OCRAgent
+from api.ocr_batcher import OCRBatcher
+
+
+def _msg(name):
+    return {"id": name, "type": "ocr.extract", "from": "test", "body": {"file_info": {"filename": name}}}
+
+
+def _name(envelope):
+    return envelope["body"]["file_info"]["filename"]
+
+
+class FakeBatchAgent:
+    supports_batch = True
+
+    def __init__(self, fail_batches=False, drop_last=False):
+        self.batches = []
+        self.fail_batches = fail_batches
+        self.drop_last = drop_last
+
+    def handle_coral(self, envelope):
+        if _name(envelope).startswith("bad"):
+            raise ValueError(f"cannot read {_name(envelope)}")
+        return {"body": {"source_file": _name(envelope)}}
+
+    def handle_coral_batch(self, envelopes):
+        self.batches.append(([_name(e) for e in envelopes], time.monotonic()))
+        if self.fail_batches and any(_name(e).startswith("bad") for e in envelopes):
+            raise RuntimeError("batch backend rejected the request")
+        results = [self.handle_coral(e) for e in envelopes if not _name(e).startswith("bad")]
+        return results[:-1] if self.drop_last else results
+
+
+async def _submit_all(batcher, names):
+    try:
+        return await asyncio.gather(*(batcher.submit(_msg(n)) for n in names), return_exceptions=True)
+    finally:
+        await batcher.close()
+
+
+def test_requests_within_the_window_share_one_batch():
+    async def run():
+        agent = FakeBatchAgent()
+        batcher = OCRBatcher(agent, max_batch=8, max_delay_ms=50)
+        first = await asyncio.gather(*(batcher.submit(_msg(n)) for n in ("a", "b", "c")))
+        later = await batcher.submit(_msg("d"))
+        await batcher.close()
+        return agent, first + [later]
+
+    agent, results = asyncio.run(run())
+    assert [r["body"]["source_file"] for r in results] == ["a", "b", "c", "d"]
+    assert [names for names, _ in agent.batches] == [["a", "b", "c"], ["d"]]
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    async def run():
+        agent = FakeBatchAgent()
+        start = time.monotonic()
+        results = await _submit_all(OCRBatcher(agent, max_batch=2, max_delay_ms=500), ["a", "b", "c", "d", "e"])
+        return agent, start, results
+
+    agent, start, results = asyncio.run(run())
+    assert [r["body"]["source_file"] for r in results] == ["a", "b", "c", "d", "e"]
+    assert [names for names, _ in agent.batches] == [["a", "b"], ["c", "d"], ["e"]]
+    # the two full batches go out at once; only the partial one waits out the 500ms window
+    assert agent.batches[1][1] - start < 0.25
+    assert agent.batches[2][1] - start >= 0.45
+
+
+def test_failing_batch_is_retried_per_message():
+    agent = FakeBatchAgent(fail_batches=True)
+    ok1, bad, ok2 = asyncio.run(_submit_all(OCRBatcher(agent, max_batch=8, max_delay_ms=50), ["a", "bad", "c"]))
+    assert ok1["body"]["source_file"] == "a" and ok2["body"]["source_file"] == "c"
+    assert isinstance(bad, RuntimeError)
+    assert sorted(names for names, _ in agent.batches) == [["a"], ["a", "bad", "c"], ["bad"], ["c"]]
+
+
+def test_short_result_list_fails_only_the_unanswered_messages():
+    agent = FakeBatchAgent(drop_last=True)
+    a, b, c = asyncio.run(_submit_all(OCRBatcher(agent, max_batch=8, max_delay_ms=50), ["a", "b", "c"]))
+    assert a["body"]["source_file"] == "a" and b["body"]["source_file"] == "b"
+    assert isinstance(c, RuntimeError) and "too few results" in str(c)
+
+
+def test_agent_without_supports_batch_bypasses_the_queue():
+    class SingleAgent(FakeBatchAgent):
+        supports_batch = False
+
+    async def run():
+        agent = SingleAgent()
+        batcher = OCRBatcher(agent, max_batch=8, max_delay_ms=5000)
+        start = time.monotonic()
+        results = await asyncio.gather(*(batcher.submit(_msg(n)) for n in ("a", "b")))
+        return agent, batcher, time.monotonic() - start, results
+
+    agent, batcher, elapsed, results = asyncio.run(run())
+    assert [r["body"]["source_file"] for r in results] == ["a", "b"]
+    assert sorted(names for names, _ in agent.batches) == [["a"], ["b"]]
+    assert batcher._runner is None and elapsed < 1.0
+
+
+@pytest.mark.parametrize("batch", [["bad"], ["a", "bad", "c"]])
+def test_ocr_agent_batch_isolates_a_failing_envelope(batch):
+    class FlakyOCRAgent(OCRAgent):
+        def handle_coral(self, envelope):
+            if _name(envelope) == "bad":
+                raise ValueError("corrupt image")
+            return super().handle_coral(envelope)
+
+    results = FlakyOCRAgent().handle_coral_batch([_msg(n) for n in batch])
+    assert len(results) == len(batch)
+    for name, resp in zip(batch, results):
+        assert resp["id"] == f"resp-{name}"
+        if name == "bad":
+            assert resp["body"] == {"status": "FAIL", "error": "corrupt image"}
+        else:
+            assert resp["body"]["source_file"] == name
@@ -0,0 +1,46 @@
+from agents.parser_agent import ParserAgent
+
+
+def _header(text):
+    parsed = ParserAgent()._basic_parse(text)
+    parsed.pop("line_items")
+    return parsed
+
+
+def test_vendor_line_containing_other_fields():
+    # vendor takes the rest of its line, while the fields on that line still count as matches
+    parsed = _header("INV-1001\nVendor: ACME Corp Date: 2025-09-18 Total: 99\nSubtotal: 50.00\nTax: 5.00\nTotal: 55.00")
+    assert parsed == {
+        "invoice_number": "INV-1001",
+        "date": "2025-09-18",
+        "vendor": "ACME Corp Date: 2025-09-18 Total: 99",
+        "subtotal": 50.0,
+        "tax": 5.0,
+        "total": 99.0,
+    }
+
+
+def test_total_tax_is_tax_not_total():
+    parsed = _header("INV-7\nVendor: Foo Tax Services\nSubtotal: 100\nTotal Tax: 10\nTotal: 110")
+    assert (parsed["vendor"], parsed["subtotal"], parsed["tax"], parsed["total"]) == ("Foo Tax Services", 100.0, 10.0, 110.0)
+
+
+def test_total_tax_before_subtotal():
+    parsed = _header("Vendor: X\nTotal Tax: 10\nSubtotal: 100\nTotal: 110")
+    assert (parsed["subtotal"], parsed["tax"], parsed["total"]) == (100.0, 10.0, 110.0)
+
+
+def test_lowercase_invoice_number():
+    assert _header("inv 42\nDate: 2025/01/02\nVendor: V")["invoice_number"] == "INV 42"
+    assert _header("inv-9 and INV-10\nVendor: V")["invoice_number"] == "INV-9"
+
+
+def test_defaults_when_nothing_matches():
+    assert _header("hello") == {
+        "invoice_number": "INV-UNKNOWN",
+        "date": "1970-01-01",
+        "vendor": "Unknown Vendor",
+        "subtotal": 50.0,
+        "tax": 5.0,
+        "total": 55.0,
+    }
@@ -0,0 +1,74 @@
+import copy
+
+import pytest
+
+from agents.validator_agent import ValidatorAgent
+
+
+def _invoice(n_items, **overrides):
+    items = [{"description": f"item {i}", "quantity": 2, "unit_price": 5.0, "total": 10.0} for i in range(n_items)]
+    subtotal = 10.0 * n_items
+    invoice = {
+        "invoice_number": "INV-1001",
+        "date": "2025-09-18",
+        "vendor": " ACME Corp ",
+        "line_items": items,
+        "subtotal": subtotal,
+        "tax": subtotal * 0.1,
+        "total": subtotal * 1.1,
+    }
+    invoice.update(overrides)
+    return invoice
+
+
+def _with_bad_item(n_items):
+    invoice = _invoice(n_items)
+    invoice["line_items"][n_items // 2]["total"] = 11.0
+    return invoice
+
+
+CASES = {
+    "empty line items": _invoice(0),
+    "empty line items, bad totals": _invoice(0, subtotal=5, tax=1, total=7),
+    "few items": _invoice(3),
+    "few items, bad line total": _with_bad_item(3),
+    "many items": _invoice(12),
+    "many items, bad line total": _with_bad_item(12),
+    "string numbers": _invoice(2, subtotal="20", tax="2", total="22.0"),
+    "schema error": {k: v for k, v in _invoice(2).items() if k != "vendor"},
+    "future date": _invoice(2, date="2999-01-01"),
+    "invalid date": _invoice(2, date="not a date"),
+    "custom rule failures": _invoice(1, invoice_number="X-1", tax=9.0, total=19.0),
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_run_batch_matches_run_data_per_case(name):
+    agent = ValidatorAgent()
+    invoice = CASES[name]
+    assert agent.run_batch([copy.deepcopy(invoice)]) == [agent.run_data(copy.deepcopy(invoice))]
+
+
+def test_run_batch_matches_run_data_for_mixed_batch():
+    agent = ValidatorAgent()
+    invoices = list(CASES.values())
+    assert agent.run_batch(copy.deepcopy(invoices)) == [agent.run_data(x) for x in copy.deepcopy(invoices)]
+
+
+def test_run_batch_empty():
+    assert ValidatorAgent().run_batch([]) == []
+
+
+def test_early_exits_skip_business_rules():
+    agent = ValidatorAgent()
+    schema_fail, date_fail = agent.run_batch([CASES["schema error"], CASES["future date"]])
+    assert schema_fail["schema_errors"] and not schema_fail["business_errors"]
+    assert date_fail["date_errors"] and not date_fail["business_errors"]
+
+
+def test_bad_line_total_reported_on_both_paths():
+    agent = ValidatorAgent()
+    for n in (3, 12):
+        (result,) = agent.run_batch([_with_bad_item(n)])
+        assert result["status"] == "FAIL"
+        assert result["business_errors"][0].startswith(f"Line item {n // 2}: total mismatch")